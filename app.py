@@ -1,8 +1,12 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-from groq import Groq
+import difflib
+from cassette import is_offline, make_client
 from agentic_patterns import ReflectionAgent
+from code_checks import findings_note, fix_request, format_findings, local_review
+from artifact_store import ChatHistory, SessionArtifacts, memory_summary
+import prompts
 
 # Load environment variables
 load_dotenv()
@@ -14,10 +18,10 @@ class FixedReflectionAgent(ReflectionAgent):
         self.model = model
         self.reflection_model = reflection_model
         api_key = os.getenv('GROQ_API_KEY')
-        if not api_key:
+        if not api_key and not is_offline():
             st.error("GROQ_API_KEY environment variable not set")
             st.stop()
-        self.client = Groq(api_key=api_key)
+        self.client = make_client(api_key=api_key)
     
     def generate(self, generation_history: list, verbose: int = 0):
         try:
@@ -47,8 +51,84 @@ class FixedReflectionAgent(ReflectionAgent):
                 st.error(f"Reflection Error: {e}")
             raise
 
+# Incremental critique helpers
+CONTEXT_LINES = 3
+
+def changed_regions(previous_code, current_code, context=CONTEXT_LINES):
+    # Line ranges of the current code touched since the previous version, padded with context
+    old_lines = previous_code.splitlines()
+    new_lines = current_code.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    ranges = []
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        start = max(j1 - context, 0)
+        end = min(max(j2, j1 + 1) + context, len(new_lines))
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    regions = []
+    for start, end in ranges:
+        numbered = [f"{n + 1:>4} | {new_lines[n]}" for n in range(start, end)]
+        regions.append("\n".join(numbered))
+    return "\n...\n".join(regions)
+
+def open_issues(full_critique, follow_up):
+    if full_critique is None or follow_up is None:
+        return full_critique
+    return f"{full_critique}\n\nYour follow-up review of the latest revision:\n\n{follow_up}"
+
+def build_critique_messages(critique_persona, code, previous_code=None, previous_critique=None, report=None):
+    persona = critique_persona.split(' ')[0]
+    note = findings_note(report) if report else ""
+    full = {'persona': persona, 'code': code, 'findings': note}
+    if previous_code is not None and previous_critique is not None:
+        diff = "\n".join(difflib.unified_diff(
+            previous_code.splitlines(), code.splitlines(),
+            fromfile="previous", tofile="revised", lineterm="", n=0
+        ))
+        regions = changed_regions(previous_code, code)
+        incremental = {
+            'persona': persona,
+            'previous_critique': previous_critique,
+            'diff': diff or "(no changes)",
+            'regions': regions or "(no changes)",
+            'findings': note,
+        }
+        # The carried critique often outweighs the code, and a near-total rewrite outweighs its diff:
+        # send whichever request is actually smaller
+        incremental_tokens = prompts.estimate_tokens(prompts.text('reflection_incremental_critique', **incremental))
+        full_tokens = prompts.estimate_tokens(prompts.text('reflection_critique', **full))
+        if incremental_tokens < full_tokens:
+            return prompts.render('reflection_incremental_critique', **incremental), "incremental"
+    return prompts.render('reflection_critique', **full), "full"
+
+def fix_rounds_for(agent, chat_history):
+    # Fix rounds continue the generation conversation with the local findings
+    def regenerate(code, report):
+        chat_history.append({"role": "assistant", "content": code})
+        chat_history.append({"role": "user", "content": fix_request(report)})
+        messages = chat_history.messages()
+        prompts.record_messages('fix_request', messages)
+        return agent.generate(messages)
+    return regenerate
+
+def show_local_review(report, fix_rounds):
+    label = f"🔎 Local checks: {len(report['errors'])} errors, {len(report['warnings'])} warnings"
+    if fix_rounds:
+        label += f" ({fix_rounds} auto-fix round{'s' if fix_rounds > 1 else ''})"
+    with st.expander(label):
+        st.markdown(format_findings(report) or "No findings")
+
 # Streamlit App
 st.set_page_config(page_title="AI Code Refinery", layout="wide")
+
+# Prompt costs are tallied for this session as well as for the whole server process
+if 'prompt_costs' not in st.session_state:
+    st.session_state.prompt_costs = {}
+prompts.bind_session(st.session_state.prompt_costs)
 st.title("🧠 AI-Powered Code")
 st.caption("Automatically generate and refine code using self-reflection patterns")
 
@@ -61,6 +141,11 @@ with st.sidebar:
         index=0
     )
     reflection_steps = st.slider("Reflection Steps", 1, 5, 3)
+    incremental_critique = st.toggle(
+        "Incremental Critique",
+        value=True,
+        help="After the first step, critique only the diff against the previous version"
+    )
     critique_persona = st.selectbox(
         "Critique Persona",
         ("Andrej Karpathy (AI Expert)", "Senior Software Engineer", "Python Guru"),
@@ -83,6 +168,7 @@ if st.button("🚀 Generate & Refine Code", use_container_width=True):
     
     # Initialize agent
     agent = FixedReflectionAgent(model=model_choice, reflection_model=model_choice)
+    artifacts = SessionArtifacts()
     
     # Create progress container
     progress_bar = st.progress(0, text="Initializing code generation...")
@@ -93,14 +179,21 @@ if st.button("🚀 Generate & Refine Code", use_container_width=True):
     status_text.subheader("Initial Implementation")
     progress_bar.progress(10, "Generating initial code...")
     
-    generate_chat_history = [
-        {"role": "system", "content": "You are an expert Python developer. Respond only with code."},
-        {"role": "user", "content": task}
-    ]
+    # Earlier turns stay in the artifact store and can be spilled while critiques run
+    generate_chat_history = ChatHistory(artifacts, prompts.render('reflection_generate', task=task))
     
-    initial_code = agent.generate(generate_chat_history)
+    initial_code = agent.generate(generate_chat_history.messages())
+    initial_code, report, fix_rounds = local_review(initial_code, fix_rounds_for(agent, generate_chat_history))
     with results_container:
         st.code(initial_code, language="python")
+        show_local_review(report, fix_rounds)
+    
+    previous_code = None
+    critique = None
+    # Incremental critiques only report what changed, so open issues are carried by the last
+    # full critique plus the latest follow-up
+    full_critique = None
+    follow_up = None
     
     # Reflection and refinement loop
     for step in range(reflection_steps):
@@ -112,17 +205,25 @@ if st.button("🚀 Generate & Refine Code", use_container_width=True):
         )
         
         # Get critique
-        critique_prompt = f"You are {critique_persona.split(' ')[0]} providing technical critique. Focus on:\n"
-        critique_prompt += "1. Algorithm correctness\n2. Code efficiency\n3. Edge cases\n4. Python best practices\n\n"
-        critique_prompt += f"Critique this code:\n\n{initial_code}"
+        if incremental_critique:
+            critique_messages, critique_mode = build_critique_messages(
+                critique_persona, initial_code, previous_code, open_issues(full_critique, follow_up), report
+            )
+        else:
+            critique_messages, critique_mode = build_critique_messages(
+                critique_persona, initial_code, report=report
+            )
         
-        critique = agent.reflect([
-            {"role": "system", "content": critique_prompt},
-            {"role": "user", "content": f"Critique this code:\n\n{initial_code}"}
-        ])
+        critique = agent.reflect(critique_messages)
+        if critique_mode == "full":
+            full_critique, follow_up = critique, None
+        else:
+            follow_up = critique
         
         with results_container:
             st.subheader(f"Step {step+1} Critique")
+            if critique_mode == "incremental":
+                st.caption("Incremental critique of the changes since the previous step")
             st.markdown(critique)
         
         # Revise code
@@ -132,17 +233,22 @@ if st.button("🚀 Generate & Refine Code", use_container_width=True):
             f"Revising code (Step {step+1}/{reflection_steps})..."
         )
         
+        previous_code = initial_code
         generate_chat_history.append({"role": "assistant", "content": initial_code})
         generate_chat_history.append({
-            "role": "user", 
-            "content": f"Based on this critique, revise the implementation:\n\n{critique}"
+            "role": "user",
+            "content": prompts.text('reflection_revise', critique=critique)
         })
         
-        initial_code = agent.generate(generate_chat_history)
+        revise_messages = generate_chat_history.messages()
+        prompts.record_messages('reflection_revise', revise_messages)
+        initial_code = agent.generate(revise_messages)
+        initial_code, report, fix_rounds = local_review(initial_code, fix_rounds_for(agent, generate_chat_history))
         
         with results_container:
             st.subheader(f"Step {step+1} Revised Code")
             st.code(initial_code, language="python")
+            show_local_review(report, fix_rounds)
     
     # Final output
     progress_bar.progress(100, "Refinement complete!")
@@ -151,4 +257,10 @@ if st.button("🚀 Generate & Refine Code", use_container_width=True):
         st.code(initial_code, language="python")
     
     st.success(f"Completed {reflection_steps} refinement cycles!")
-    st.balloons()
\ No newline at end of file
+    st.balloons()
+
+st.sidebar.caption(memory_summary())
+with st.sidebar.expander("Prompt token cost, this session (estimated)"):
+    st.markdown(prompts.cost_markdown(st.session_state.prompt_costs))
+with st.sidebar.expander("Prompt token cost, all sessions on this server (estimated)"):
+    st.markdown(prompts.cost_markdown())
\ No newline at end of file
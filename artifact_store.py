@@ -0,0 +1,319 @@
+import atexit
+import os
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+
+# Process-wide store for LLM artifacts (generated content, critiques, code, chat history).
+# Everything lives under one in-memory LRU budget shared by all sessions; cold artifacts are
+# spilled to compressed files and reloaded transparently on access.
+#
+#   ARTIFACT_MEMORY_BUDGET_MB  in-memory budget for all sessions together (default 64)
+#   ARTIFACT_SPILL_DIR         parent directory for spill files (default: system temp dir)
+#
+# Each process spills into its own <ARTIFACT_SPILL_DIR>/artifact-spill/<pid>-<random> directory and
+# holds an flock on the sibling <dir>.lock file for as long as it lives. atexit does not run when a
+# server is OOM-killed, so at startup every directory whose lock can be taken is removed: the
+# kernel released it, so its owner is gone. Pids alone cannot tell, as containers sharing the
+# directory reuse them. Without fcntl (Windows) nothing is removed at startup.
+DEFAULT_BUDGET_MB = 64
+COMPRESSION_LEVEL = 6
+SPILL_ROOT_NAME = "artifact-spill"
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def try_lock(path):
+    # Returns the open, exclusively locked file descriptor, or None when another process holds it
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def remove_stale_spill_dirs(spill_root):
+    if fcntl is None:
+        return
+    for entry in os.listdir(spill_root):
+        if not entry.endswith(".lock"):
+            continue
+        lock_path = os.path.join(spill_root, entry)
+        fd = try_lock(lock_path)
+        if fd is None:
+            continue
+        try:
+            shutil.rmtree(lock_path[:-len(".lock")], ignore_errors=True)
+            remove_files([lock_path])
+        finally:
+            os.close(fd)
+
+
+def claim_spill_dir(spill_root):
+    # The lock is taken before the directory exists, so a live directory is never unlocked
+    while True:
+        spill_dir = os.path.join(spill_root, f"{os.getpid()}-{uuid.uuid4().hex[:12]}")
+        if fcntl is None:
+            os.makedirs(spill_dir)
+            return spill_dir, None
+        lock_path = spill_dir + ".lock"
+        fd = try_lock(lock_path)
+        if fd is None:
+            continue
+        try:
+            same_file = os.path.samestat(os.fstat(fd), os.stat(lock_path))
+        except FileNotFoundError:
+            same_file = False
+        if not same_file:
+            # A cleaner removed the lock file between our open and flock; pick another name
+            os.close(fd)
+            continue
+        os.makedirs(spill_dir)
+        return spill_dir, fd
+
+
+def release_spill_dir(spill_dir, lock_fd):
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    if lock_fd is not None:
+        remove_files([spill_dir + ".lock"])
+        os.close(lock_fd)
+
+
+class ArtifactStore:
+    def __init__(self, budget_bytes, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        spill_root = os.path.join(spill_dir or tempfile.gettempdir(), SPILL_ROOT_NAME)
+        os.makedirs(spill_root, exist_ok=True)
+        remove_stale_spill_dirs(spill_root)
+        self.spill_dir, self.lock_fd = claim_spill_dir(spill_root)
+        # Guards only the index and counters; compression and file I/O run outside it.
+        # Re-entrant: a session finalizer can fire from garbage collection while the lock is held
+        self.lock = threading.RLock()
+        self.memory = OrderedDict()
+        # Evicted artifacts still being written out, readable until their file is in place
+        self.pending = {}
+        # key -> (path, compressed size); every spill gets a fresh file name, so files never change
+        self.spilled = {}
+        self.memory_bytes = 0
+        self.counters = {'hits': 0, 'reloads': 0, 'spills': 0}
+        atexit.register(release_spill_dir, self.spill_dir, self.lock_fd)
+
+    def spill_path(self, key):
+        session_id, name = key
+        filename = f"{name.replace('/', '__')}-{uuid.uuid4().hex[:8]}.z"
+        return os.path.join(self.spill_dir, session_id, filename)
+
+    def put(self, session_id, name, value):
+        key = (session_id, name)
+        with self.lock:
+            stale = self.discard(key)
+            if value:
+                self.memory[key] = value
+                self.memory_bytes += len(value.encode("utf-8"))
+                victims = self.evict()
+            else:
+                victims = []
+        remove_files(stale)
+        self.spill(victims)
+
+    def get(self, session_id, name, default=""):
+        key = (session_id, name)
+        while True:
+            with self.lock:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return self.memory[key]
+                if key in self.pending:
+                    # Reclaimed before its write finished; the writer drops the file
+                    value = self.pending.pop(key)
+                    self.counters['hits'] += 1
+                    victims = self.restore(key, value)
+                    break
+                if key not in self.spilled:
+                    return default
+                entry = self.spilled[key]
+            try:
+                with open(entry[0], "rb") as f:
+                    value = zlib.decompress(f.read()).decode("utf-8")
+            except FileNotFoundError:
+                with self.lock:
+                    if self.spilled.get(key) != entry:
+                        # Another thread reloaded or discarded it first; look again
+                        continue
+                    # The file was removed behind our back (tmp cleaner, manual cleanup): it is lost
+                    del self.spilled[key]
+                    return default
+            with self.lock:
+                if self.spilled.get(key) != entry:
+                    continue
+                del self.spilled[key]
+                self.counters['reloads'] += 1
+                victims = self.restore(key, value)
+            remove_files([entry[0]])
+            break
+        self.spill(victims)
+        return value
+
+    def restore(self, key, value):
+        self.memory[key] = value
+        self.memory_bytes += len(value.encode("utf-8"))
+        return self.evict(keep=key)
+
+    def discard(self, key):
+        # Drops the index entries; returns spill files for the caller to remove outside the lock
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key).encode("utf-8"))
+        self.pending.pop(key, None)
+        if key in self.spilled:
+            return [self.spilled.pop(key)[0]]
+        return []
+
+    def evict(self, keep=None):
+        # Least recently used first; the artifact just touched stays resident even over budget.
+        # Victims move to pending and are written by spill() once the lock is released.
+        victims = []
+        while self.memory_bytes > self.budget_bytes and self.memory:
+            key = next(iter(self.memory))
+            if key == keep:
+                if len(self.memory) == 1:
+                    break
+                self.memory.move_to_end(key)
+                key = next(iter(self.memory))
+            value = self.memory.pop(key)
+            self.memory_bytes -= len(value.encode("utf-8"))
+            self.pending[key] = value
+            victims.append((key, value))
+        return victims
+
+    def spill(self, victims):
+        for key, value in victims:
+            path = self.spill_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL))
+                os.replace(path + ".tmp", path)
+                size = os.path.getsize(path)
+            except OSError:
+                # Disk trouble: keep the artifact in memory rather than lose it
+                with self.lock:
+                    if self.pending.get(key) is value:
+                        del self.pending[key]
+                        self.memory[key] = value
+                        self.memory_bytes += len(value.encode("utf-8"))
+                continue
+            with self.lock:
+                current = self.pending.get(key) is value
+                if current:
+                    del self.pending[key]
+                    self.spilled[key] = (path, size)
+                    self.counters['spills'] += 1
+            if not current:
+                # Reloaded, replaced or discarded while the file was being written
+                remove_files([path])
+
+    def clear_session(self, session_id):
+        with self.lock:
+            keys = {key for key in [*self.memory, *self.pending, *self.spilled] if key[0] == session_id}
+            for key in keys:
+                self.discard(key)
+        shutil.rmtree(os.path.join(self.spill_dir, session_id), ignore_errors=True)
+
+    def stats(self):
+        with self.lock:
+            sessions = {key[0] for key in [*self.memory, *self.pending, *self.spilled]}
+            return {
+                'budget_bytes': self.budget_bytes,
+                'memory_bytes': self.memory_bytes,
+                'memory_artifacts': len(self.memory),
+                'spilled_artifacts': len(self.spilled),
+                'spilled_bytes': sum(size for _, size in self.spilled.values()),
+                'sessions': len(sessions),
+                **self.counters,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            budget_mb = float(os.getenv("ARTIFACT_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB))
+            _store = ArtifactStore(int(budget_mb * 2 ** 20), os.getenv("ARTIFACT_SPILL_DIR"))
+        return _store
+
+
+def memory_summary():
+    stats = get_store().stats()
+    return (
+        f"Artifact memory: {stats['memory_bytes'] / 2 ** 20:.1f} / {stats['budget_bytes'] / 2 ** 20:.1f} MB "
+        f"across {stats['sessions']} session(s) · {stats['spilled_artifacts']} spilled "
+        f"({stats['spilled_bytes'] / 2 ** 10:.0f} KB on disk) · {stats['reloads']} reloads"
+    )
+
+
+class SessionArtifacts:
+    # Attribute and item access map to one session's artifacts; unset artifacts read as ""
+    def __init__(self, store=None):
+        store = store or get_store()
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "_session_id", uuid.uuid4().hex)
+        # Artifacts are released as soon as the session (and with it this object) goes away
+        weakref.finalize(self, store.clear_session, self._session_id)
+
+    def __getitem__(self, name):
+        return self._store.get(self._session_id, name)
+
+    def __setitem__(self, name, value):
+        self._store.put(self._session_id, name, value)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class ChatHistory:
+    # Chat messages whose contents are kept in the artifact store until a request needs them
+    def __init__(self, artifacts, messages=()):
+        self.artifacts = artifacts
+        self.name = f"history-{uuid.uuid4().hex[:8]}"
+        self.roles = []
+        for message in messages:
+            self.append(message)
+
+    def append(self, message):
+        self.artifacts[f"{self.name}/{len(self.roles)}"] = message['content']
+        self.roles.append(message['role'])
+
+    def messages(self):
+        return [
+            {'role': role, 'content': self.artifacts[f"{self.name}/{index}"]}
+            for index, role in enumerate(self.roles)
+        ]
+
+    def __len__(self):
+        return len(self.roles)
@@ -0,0 +1,312 @@
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from groq import Groq
+
+# Record/replay of chat completions for deterministic offline runs.
+#
+#   CASSETTE_MODE      off (default) | record | replay | fake
+#   CASSETTE_PATH      cassette file, gzip-compressed when it ends in .gz
+#   CASSETTE_PLAYBACK  fast (default, no delays) | realtime (original timing)
+#   CASSETTE_MATCH     strict (default, exact request) | fuzzy (model + normalized messages,
+#                      then the closest recorded request)
+#   CASSETTE_FAKE_LATENCY  seconds per fake response (fake mode serves canned replies, no cassette)
+DEFAULT_PATH = "cassettes/session.jsonl.gz"
+FUZZY_CUTOFF = 0.6
+
+FAKE_CODE = '''```python
+def merge_sort(items):
+    if len(items) <= 1:
+        return list(items)
+    middle = len(items) // 2
+    left = merge_sort(items[:middle])
+    right = merge_sort(items[middle:])
+    merged = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] <= right[j]:
+            merged.append(left[i])
+            i += 1
+        else:
+            merged.append(right[j])
+            j += 1
+    merged.extend(left[i:])
+    merged.extend(right[j:])
+    return merged
+```'''
+FAKE_TEXT = (
+    "## A Fresh Take\n\n"
+    "Plain, well-structured placeholder text served by the fake backend. "
+    "It stands in for a model reply so sessions can be driven offline.\n\n"
+    "#placeholder #offline"
+)
+
+
+class CassetteMissError(LookupError):
+    pass
+
+
+def cassette_mode():
+    return os.getenv("CASSETTE_MODE", "off").lower()
+
+
+def is_offline():
+    # Responses are served locally and no API key is needed
+    return cassette_mode() in ("replay", "fake")
+
+
+def open_cassette(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def request_fields(kwargs):
+    return {key: value for key, value in sorted(kwargs.items()) if value is not None}
+
+
+def strict_key(request):
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def fuzzy_text(request):
+    messages = request.get("messages", [])
+    return "\n".join(
+        f"{message.get('role')}: {' '.join(str(message.get('content', '')).split())}"
+        for message in messages
+    )
+
+
+def fuzzy_key(request):
+    return strict_key({"model": request.get("model"), "messages": fuzzy_text(request)})
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = []
+        self.strict_index = {}
+        self.fuzzy_index = {}
+        self.cursors = {}
+        if os.path.exists(path):
+            with open_cassette(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self.add(json.loads(line))
+
+    def add(self, entry):
+        position = len(self.entries)
+        self.entries.append(entry)
+        self.strict_index.setdefault(entry["key"], []).append(position)
+        self.fuzzy_index.setdefault(fuzzy_key(entry["request"]), []).append(position)
+
+    def record(self, entry):
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # One gzip member per entry keeps appends cheap and the file readable as a whole
+            with open_cassette(self.path, "a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.add(entry)
+
+    def next_from(self, index_name, key):
+        # Repeated identical requests are served in recorded order, cycling when exhausted
+        positions = getattr(self, index_name)[key]
+        cursor = self.cursors.get((index_name, key), 0)
+        self.cursors[(index_name, key)] = cursor + 1
+        return self.entries[positions[cursor % len(positions)]]
+
+    def lookup(self, request, match):
+        key = strict_key(request)
+        with self.lock:
+            if key in self.strict_index:
+                return self.next_from("strict_index", key)
+            if match != "fuzzy":
+                raise CassetteMissError(
+                    f"No recorded response for this {request.get('model')} request in {self.path}"
+                )
+            key = fuzzy_key(request)
+            if key in self.fuzzy_index:
+                return self.next_from("fuzzy_index", key)
+            text = fuzzy_text(request)
+            best, best_ratio = None, FUZZY_CUTOFF
+            for entry in self.entries:
+                if entry["request"].get("model") != request.get("model"):
+                    continue
+                ratio = difflib.SequenceMatcher(None, text, fuzzy_text(entry["request"])).ratio()
+                if ratio >= best_ratio:
+                    best, best_ratio = entry, ratio
+            if best is None:
+                raise CassetteMissError(
+                    f"No recorded response close to this {request.get('model')} request in {self.path}"
+                )
+            return best
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def load_cassette(path):
+    # Shared across Streamlit reruns and sessions so the file is parsed once per process
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def response_to_dict(response):
+    choice = response.choices[0]
+    usage = getattr(response, "usage", None)
+    return {
+        "content": choice.message.content,
+        "finish_reason": getattr(choice, "finish_reason", None),
+        "model": getattr(response, "model", None),
+        "usage": {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+        } if usage is not None else None,
+    }
+
+
+def dict_to_response(data):
+    return SimpleNamespace(
+        model=data.get("model"),
+        choices=[SimpleNamespace(
+            index=0,
+            finish_reason=data.get("finish_reason"),
+            message=SimpleNamespace(role="assistant", content=data.get("content")),
+        )],
+        usage=SimpleNamespace(**data["usage"]) if data.get("usage") else None,
+    )
+
+
+def dict_to_chunk(delta, finish_reason=None):
+    return SimpleNamespace(choices=[SimpleNamespace(
+        index=0,
+        finish_reason=finish_reason,
+        delta=SimpleNamespace(role="assistant", content=delta),
+    )])
+
+
+class RecordingCompletions:
+    def __init__(self, completions, cassette):
+        self.completions = completions
+        self.cassette = cassette
+
+    def create(self, **kwargs):
+        request = request_fields(kwargs)
+        started = time.perf_counter()
+        response = self.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self.record_stream(request, response, started)
+        self.cassette.record({
+            "key": strict_key(request),
+            "request": request,
+            "response": response_to_dict(response),
+            "elapsed": round(time.perf_counter() - started, 4),
+        })
+        return response
+
+    def record_stream(self, request, stream, started):
+        chunks = []
+        finish_reason = None
+        for chunk in stream:
+            choice = chunk.choices[0] if chunk.choices else None
+            if choice is not None:
+                finish_reason = getattr(choice, "finish_reason", None) or finish_reason
+                delta = getattr(choice.delta, "content", None)
+                if delta:
+                    chunks.append([round(time.perf_counter() - started, 4), delta])
+            yield chunk
+        self.cassette.record({
+            "key": strict_key(request),
+            "request": request,
+            "response": {"content": "".join(delta for _, delta in chunks), "finish_reason": finish_reason},
+            "chunks": chunks,
+            "elapsed": round(time.perf_counter() - started, 4),
+        })
+
+
+class ReplayCompletions:
+    def __init__(self, cassette, playback, match):
+        self.cassette = cassette
+        self.playback = playback
+        self.match = match
+
+    def create(self, **kwargs):
+        entry = self.cassette.lookup(request_fields(kwargs), self.match)
+        if kwargs.get("stream"):
+            return self.replay_stream(entry)
+        if self.playback == "realtime":
+            time.sleep(entry.get("elapsed", 0))
+        return dict_to_response(entry["response"])
+
+    def replay_stream(self, entry):
+        chunks = entry.get("chunks") or [[entry.get("elapsed", 0), entry["response"]["content"]]]
+        started = time.perf_counter()
+        for offset, delta in chunks:
+            if self.playback == "realtime":
+                time.sleep(max(offset - (time.perf_counter() - started), 0))
+            yield dict_to_chunk(delta)
+        yield dict_to_chunk(None, entry["response"].get("finish_reason") or "stop")
+
+
+class FakeCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, **kwargs):
+        text = fuzzy_text(request_fields(kwargs)).lower()
+        content = FAKE_CODE if "code" in text else FAKE_TEXT
+        if kwargs.get("stream"):
+            return self.fake_stream(content)
+        time.sleep(self.latency)
+        return dict_to_response({
+            "content": content,
+            "finish_reason": "stop",
+            "model": kwargs.get("model"),
+            "usage": {
+                "prompt_tokens": len(text) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(text) + len(content)) // 4,
+            },
+        })
+
+    def fake_stream(self, content):
+        lines = content.splitlines(keepends=True)
+        for line in lines:
+            time.sleep(self.latency / len(lines))
+            yield dict_to_chunk(line)
+        yield dict_to_chunk(None, "stop")
+
+
+class CassetteClient:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+def make_client(api_key=None):
+    mode = cassette_mode()
+    if mode == "fake":
+        return CassetteClient(FakeCompletions(float(os.getenv("CASSETTE_FAKE_LATENCY", "0"))))
+    if mode not in ("record", "replay"):
+        return Groq(api_key=api_key)
+    cassette = load_cassette(os.getenv("CASSETTE_PATH", DEFAULT_PATH))
+    if mode == "record":
+        return CassetteClient(RecordingCompletions(Groq(api_key=api_key).chat.completions, cassette))
+    return CassetteClient(ReplayCompletions(
+        cassette,
+        playback=os.getenv("CASSETTE_PLAYBACK", "fast").lower(),
+        match=os.getenv("CASSETTE_MATCH", "strict").lower(),
+    ))
@@ -0,0 +1,248 @@
+import ast
+import re
+import threading
+
+import prompts
+
+# Local static checks run on generated Python before it is sent for LLM critique
+# Fences only open and close at the start of a line, so ``` inside a string literal is left alone
+FENCE_BLOCK = re.compile(r"^[ \t]*```[ \t]*([\w+-]*)[^\n]*\n(.*?)^[ \t]*```[ \t]*$", re.DOTALL | re.MULTILINE)
+FENCE_LINE = re.compile(r"^[ \t]*```.*$", re.MULTILINE)
+PYTHON_FENCE_TAGS = ("", "python", "py", "python3")
+IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+MAX_LINE_LENGTH = 120
+MAX_COMPLEXITY = 10
+MAX_FIX_ROUNDS = 2
+
+BRANCH_NODES = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler,
+    ast.IfExp, ast.Assert, ast.comprehension
+)
+NESTING_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# Streamlit runs each session's script in its own thread of one server process, and concurrent
+# ast.parse calls can fail there on CPython 3.11 ("AST constructor recursion depth mismatch")
+_parse_lock = threading.Lock()
+
+
+def strip_fences(text):
+    # The largest Python block is the implementation; usage and doctest blocks are not code
+    blocks = [
+        body.strip("\n") for tag, body in FENCE_BLOCK.findall(text)
+        if tag.lower() in PYTHON_FENCE_TAGS and not body.lstrip().startswith(">>>")
+    ]
+    if blocks:
+        return max(blocks, key=len), True
+    # Unclosed or stray fences: drop only a fence on the first or last line
+    lines = text.strip("\n").splitlines()
+    if lines and FENCE_LINE.fullmatch(lines[0]):
+        lines = lines[1:]
+    if lines and FENCE_LINE.fullmatch(lines[-1]):
+        lines = lines[:-1]
+    stripped = "\n".join(lines)
+    return stripped, stripped != text.strip("\n")
+
+
+def function_complexity(node):
+    complexity = 1
+    for child in ast.walk(node):
+        if child is not node and isinstance(child, FUNCTION_NODES + (ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(child, BRANCH_NODES):
+            complexity += 1
+            if isinstance(child, ast.comprehension):
+                complexity += len(child.ifs)
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+    return complexity
+
+
+def nesting_depth(node, depth=0):
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        child_depth = depth + 1 if isinstance(child, NESTING_NODES) else depth
+        if isinstance(child, FUNCTION_NODES + (ast.ClassDef,)):
+            child_depth = 0
+        deepest = max(deepest, nesting_depth(child, child_depth))
+    return deepest
+
+
+def string_annotation_names(tree):
+    # Forward references such as def f(a: 'List[int]') use names without an ast.Name node
+    annotations = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.arg) and node.annotation is not None:
+            annotations.append(node.annotation)
+        elif isinstance(node, FUNCTION_NODES) and node.returns is not None:
+            annotations.append(node.returns)
+        elif isinstance(node, ast.AnnAssign):
+            annotations.append(node.annotation)
+    names = set()
+    for annotation in annotations:
+        for node in ast.walk(annotation):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                names.update(IDENTIFIER.findall(node.value))
+    return names
+
+
+def lint(tree, code):
+    warnings = []
+
+    imported = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported[(alias.asname or alias.name).split(".")[0]] = node.lineno
+        elif isinstance(node, ast.ImportFrom) and node.module != "__future__":
+            for alias in node.names:
+                if alias.name != "*":
+                    imported[alias.asname or alias.name] = node.lineno
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    used.update(string_annotation_names(tree))
+    exported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets
+        ):
+            exported.update(
+                elt.value for elt in getattr(node.value, "elts", [])
+                if isinstance(elt, ast.Constant) and isinstance(elt.value, str)
+            )
+    for name, lineno in sorted(imported.items(), key=lambda item: item[1]):
+        if name not in used and name not in exported:
+            warnings.append(f"line {lineno}: '{name}' imported but unused")
+
+    defined = {}
+    for node in tree.body:
+        if isinstance(node, FUNCTION_NODES + (ast.ClassDef,)):
+            if node.name in defined:
+                warnings.append(
+                    f"line {node.lineno}: '{node.name}' redefines the definition on line {defined[node.name]}"
+                )
+            defined[node.name] = node.lineno
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler) and node.type is None:
+            warnings.append(f"line {node.lineno}: bare 'except:' catches SystemExit and KeyboardInterrupt")
+        elif isinstance(node, FUNCTION_NODES):
+            defaults = node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+            for default in defaults:
+                if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                    warnings.append(
+                        f"line {node.lineno}: '{node.name}' uses a mutable default argument"
+                    )
+                    break
+            complexity = function_complexity(node)
+            if complexity > MAX_COMPLEXITY:
+                warnings.append(
+                    f"line {node.lineno}: '{node.name}' has cyclomatic complexity {complexity} "
+                    f"(limit {MAX_COMPLEXITY})"
+                )
+        elif isinstance(node, ast.Compare):
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(comparator, ast.Constant) \
+                        and comparator.value is None:
+                    warnings.append(f"line {node.lineno}: comparison to None should use 'is' / 'is not'")
+
+    long_lines = [n for n, line in enumerate(code.splitlines(), 1) if len(line) > MAX_LINE_LENGTH]
+    if long_lines:
+        shown = ", ".join(str(n) for n in long_lines[:5])
+        more = "..." if len(long_lines) > 5 else ""
+        warnings.append(f"lines longer than {MAX_LINE_LENGTH} characters: {shown}{more}")
+    if any(line != line.rstrip() for line in code.splitlines()):
+        warnings.append("trailing whitespace")
+    indents = [line[:len(line) - len(line.lstrip())] for line in code.splitlines()]
+    if any("\t" in indent for indent in indents) and any(" " in indent for indent in indents):
+        warnings.append("mixed tabs and spaces in indentation")
+
+    return warnings
+
+
+def metrics(tree, code):
+    functions = [node for node in ast.walk(tree) if isinstance(node, FUNCTION_NODES)]
+    complexities = [function_complexity(node) for node in functions]
+    return {
+        'lines': sum(
+            1 for line in code.splitlines() if line.strip() and not line.strip().startswith("#")
+        ),
+        'functions': len(functions),
+        'classes': sum(1 for node in ast.walk(tree) if isinstance(node, ast.ClassDef)),
+        'max_complexity': max(complexities, default=0),
+        'avg_complexity': round(sum(complexities) / len(complexities), 1) if complexities else 0,
+        'max_nesting': nesting_depth(tree),
+    }
+
+
+def analyze_code(text):
+    code, had_fences = strip_fences(text)
+    report = {
+        'code': code,
+        'errors': [],
+        'warnings': [],
+        'notes': [],
+        'metrics': {},
+    }
+    if had_fences:
+        report['notes'].append("Markdown fences and surrounding prose were stripped")
+
+    if not code.strip():
+        report['errors'].append("No code found in the response")
+        return report
+
+    try:
+        with _parse_lock:
+            tree = ast.parse(code)
+            compile(tree, "<generated>", "exec")
+    except SyntaxError as e:
+        location = f"line {e.lineno}: " if e.lineno else ""
+        report['errors'].append(f"{location}SyntaxError: {e.msg}")
+        return report
+
+    report['warnings'] = lint(tree, code)
+    report['metrics'] = metrics(tree, code)
+    return report
+
+
+def format_findings(report):
+    lines = []
+    if report['errors']:
+        lines.append("Errors:")
+        lines.extend(f"- {error}" for error in report['errors'])
+    if report['warnings']:
+        lines.append("Lint warnings:")
+        lines.extend(f"- {warning}" for warning in report['warnings'])
+    if report['metrics']:
+        m = report['metrics']
+        lines.append(
+            f"Metrics: {m['lines']} lines of code, {m['functions']} functions, {m['classes']} classes, "
+            f"max cyclomatic complexity {m['max_complexity']} (avg {m['avg_complexity']}), "
+            f"max nesting depth {m['max_nesting']}"
+        )
+    return "\n".join(lines)
+
+
+def fix_request(report):
+    return prompts.text('fix_request', findings=format_findings(report))
+
+
+def findings_note(report):
+    findings = format_findings(report)
+    if not findings:
+        return ""
+    return prompts.text('findings_note', findings=findings)
+
+
+def local_review(code, regenerate, max_rounds=MAX_FIX_ROUNDS):
+    # Hard errors get an immediate revise-with-findings round before anything reaches the critic.
+    # regenerate(code, report) returns revised code, or None when the fix request failed.
+    report = analyze_code(code)
+    fix_rounds = 0
+    while report['errors'] and fix_rounds < max_rounds:
+        revised = regenerate(code, report)
+        if revised is None:
+            break
+        code = revised
+        report = analyze_code(code)
+        fix_rounds += 1
+    return report['code'] or code, report, fix_rounds
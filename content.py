@@ -1,13 +1,14 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
-from groq import Groq
+from cassette import make_client
+import prompts
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Groq client
-client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+client = make_client(api_key=os.getenv('GROQ_API_KEY'))
 
 # App Configuration
 st.set_page_config(
@@ -24,6 +25,11 @@ if 'critique' not in st.session_state:
 if 'revised_content' not in st.session_state:
     st.session_state.revised_content = ""
 
+# Prompt costs are tallied for this session as well as for the whole server process
+if 'prompt_costs' not in st.session_state:
+    st.session_state.prompt_costs = {}
+prompts.bind_session(st.session_state.prompt_costs)
+
 # UI Elements
 st.title("✨ AI-Powered Content Studio")
 st.subheader("Generate → Critique → Refine")
@@ -49,32 +55,14 @@ with st.expander("🎯 Generate Marketing Content", expanded=True):
         if st.form_submit_button("Generate Content"):
             with st.spinner("Creating compelling content..."):
                 # Build prompt with user inputs
-                user_prompt = (
-                    f"Create captivating marketing content about {topic}. "
-                    f"Key features: {feature1}, {feature2}. "
-                    f"Target audience: {audience}."
+                generate_chat_history = prompts.render(
+                    'content_generate',
+                    tone="captivating",
+                    topic=topic,
+                    features=f"{feature1}\n{feature2}",
+                    audience=audience
                 )
                 
-                generate_chat_history = [
-                    {
-                        'role': 'system',
-                        'content': (
-                            "You are a visionary Content Creator specializing in compelling marketing narratives. "
-                            "Generate emotionally resonant content that:\n"
-                            "1. Captures attention within 3 seconds\n"
-                            "2. Highlights unique value propositions\n"
-                            "3. Uses vivid sensory language\n"
-                            "4. Includes strategic CTAs\n\n"
-                            "Format responses with:\n"
-                            "- Engaging headline\n"
-                            "- Core narrative (2-3 paragraphs)\n"
-                            "- Hashtag strategy\n"
-                            "- Platform-ready hooks (first 125 characters)"
-                        )
-                    },
-                    {'role': 'user', 'content': user_prompt}
-                ]
-                
                 response = client.chat.completions.create(
                     messages=generate_chat_history,
                     model=model_name,
@@ -92,36 +80,10 @@ with st.expander("🎯 Generate Marketing Content", expanded=True):
         with st.expander("🔍 Get Expert Critique"):
             if st.button("Analyze Content Quality"):
                 with st.spinner("Getting expert analysis..."):
-                    reflection_history = [
-                        {
-                            'role': 'system',
-                            'content': (
-                                "You are Darren Rowse, veteran content strategist with 15+ years experience. "
-                                "Provide razor-sharp critiques that:\n"
-                                "1. Evaluate content effectiveness against marketing objectives\n"
-                                "2. Assess emotional resonance and audience alignment\n"
-                                "3. Identify structural weaknesses and optimization opportunities\n\n"
-                                "Critique format:\n"
-                                "- 🎯 Objective Alignment (1-5)\n"
-                                "- 💔 Engagement Gaps\n"
-                                "- ✨ Top Strengths\n"
-                                "- 🔥 Improvement Priorities\n"
-                                "- 🛠️ Quick Wins\n"
-                                "- 📈 Strategic Recommendations"
-                            )
-                        },
-                        {
-                            'role': 'user',
-                            'content': (
-                                f"Perform expert content audit on this marketing content:\n\n"
-                                f"```\n{st.session_state.generated_content}\n```\n\n"
-                                "Key evaluation criteria:\n"
-                                "• Conversion potential\n"
-                                "• Brand voice consistency\n"
-                                "• Platform-specific optimization"
-                            )
-                        }
-                    ]
+                    reflection_history = prompts.render(
+                        'content_critique',
+                        content=st.session_state.generated_content
+                    )
                     
                     critique_response = client.chat.completions.create(
                         messages=reflection_history,
@@ -140,16 +102,11 @@ with st.expander("🎯 Generate Marketing Content", expanded=True):
             with st.expander("🔄 Revise Content"):
                 if st.button("Generate Improved Version"):
                     with st.spinner("Refining content..."):
-                        revision_history = [
-                            {
-                                'role': 'system',
-                                'content': "You are an expert content editor. Improve the following content based on the provided critique."
-                            },
-                            {
-                                'role': 'user',
-                                'content': f"Original Content:\n{st.session_state.generated_content}\n\nCritique:\n{st.session_state.critique}"
-                            }
-                        ]
+                        revision_history = prompts.render(
+                            'content_revise',
+                            content=st.session_state.generated_content,
+                            critique=st.session_state.critique
+                        )
                         
                         revision_response = client.chat.completions.create(
                             messages=revision_history,
@@ -183,4 +140,9 @@ st.sidebar.markdown("""
 - Increase creativity for more experimental content
 - Use lower temperature for factual accuracy
 - For long-form content, increase max tokens
-""")
\ No newline at end of file
+""")
+
+with st.sidebar.expander("Prompt token cost, this session (estimated)"):
+    st.markdown(prompts.cost_markdown(st.session_state.prompt_costs))
+with st.sidebar.expander("Prompt token cost, all sessions on this server (estimated)"):
+    st.markdown(prompts.cost_markdown())
@@ -0,0 +1,317 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+
+# Multi-session load test for main_app.py.
+#
+# Drives N concurrent scripted sessions through the Content Studio and Code Studio flows with
+# Streamlit's testing API. Completions are served locally (fake backend by default, or a
+# recorded cassette), so the numbers reflect the app itself: whole-script reruns, client
+# construction and the trailing sleep.
+#
+# AppTest swaps a process-global Runtime on every run, so each session lives in its own worker
+# process. Every worker loads the app once, then all of them start clicking at the same moment.
+#
+# A real server runs all sessions in one process, sharing one GIL, artifact store, prompt
+# registry and cassette. The workers share none of that, so by default they are pinned to a
+# single CPU: throughput and CPU figures then approximate one server process on one core.
+# With --all-cpus the workers spread out and the figures describe isolated processes only.
+#
+#   python loadtest.py --sessions 20 --iterations 3 --latency 0.2
+#   python loadtest.py --sessions 10 --cassette cassettes/session.jsonl.gz --json report.json
+
+CONTENT_FLOW = [
+    ("generate_content", "Generate Content", None),
+    ("content_critique", None, "content_critique_btn"),
+    ("content_revise", None, "content_revise_btn"),
+]
+CODE_FLOW = [
+    ("generate_code", "Generate Code", None),
+    ("code_critique", None, "code_critique_btn"),
+    ("code_revise", None, "code_revise_btn"),
+    ("final_refinement", None, "final_refinement"),
+    ("test_cases", None, "test_cases_btn"),
+]
+FLOWS = {
+    'content': CONTENT_FLOW,
+    'code': CODE_FLOW,
+    'both': CONTENT_FLOW + CODE_FLOW,
+}
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def find_button(at, label, key):
+    if key is not None:
+        return at.button(key=key)
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"No button labelled {label!r}")
+
+
+class Session:
+    def __init__(self, app_path, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(app_path, default_timeout=timeout)
+        self.timings = []
+        self.failures = []
+
+    def rerun(self, step, action):
+        started = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            self.failures.append(f"{step}: {e!r}")
+            return False
+        self.timings.append((step, time.perf_counter() - started))
+        if self.at.exception:
+            self.failures.append(f"{step}: {self.at.exception[0].value}")
+            return False
+        return True
+
+    def run_flow(self, flow, iterations):
+        for _ in range(iterations):
+            for step, label, key in flow:
+                if not self.rerun(step, lambda: find_button(self.at, label, key).click().run()):
+                    return
+
+
+def configure_backend(args):
+    if args.cassette:
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_PATH"] = args.cassette
+        os.environ["CASSETTE_PLAYBACK"] = "realtime" if args.realtime else "fast"
+        os.environ["CASSETTE_MATCH"] = "fuzzy"
+    else:
+        os.environ["CASSETTE_MODE"] = "fake"
+        os.environ["CASSETTE_FAKE_LATENCY"] = str(args.latency)
+
+
+def pin_cpu(cpu):
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+
+def session_worker(index, args, start_gate, results):
+    record = {
+        'index': index,
+        'initial_load': None,
+        'timings': [],
+        'failures': [],
+        'cpu_seconds': 0.0,
+        'loaded_rss': None,
+        'final_rss': None,
+    }
+    # Always report back, and always reach the barrier, so one broken session cannot stall the run
+    try:
+        session = None
+        try:
+            pin_cpu(args.pin_cpu)
+            configure_backend(args)
+            session = Session(args.app, args.timeout)
+            session.rerun("initial_load", session.at.run)
+            record['initial_load'] = session.timings.pop() if session.timings else None
+            record['loaded_rss'] = rss_bytes()
+        except Exception as e:
+            record['failures'].append(f"setup: {e!r}")
+
+        try:
+            start_gate.wait(timeout=args.timeout)
+        except threading.BrokenBarrierError:
+            record['failures'].append("start barrier broken: another session failed to start")
+            return
+
+        if session is not None and not session.failures:
+            cpu_started = cpu_seconds()
+            session.run_flow(FLOWS[args.flow], args.iterations)
+            record['cpu_seconds'] = cpu_seconds() - cpu_started
+            record['final_rss'] = rss_bytes()
+        if session is not None:
+            record['timings'] = session.timings
+            record['failures'].extend(session.failures)
+    except Exception as e:
+        record['failures'].append(f"worker: {e!r}")
+    finally:
+        results.put(record)
+
+
+def collect_results(workers, results):
+    records = {}
+    while len(records) < len(workers):
+        try:
+            record = results.get(timeout=1.0)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                # Dead workers may still have a record in flight; give the queue one last chance
+                try:
+                    record = results.get(timeout=1.0)
+                except queue.Empty:
+                    break
+            else:
+                continue
+        records[record['index']] = record
+    for worker in workers:
+        worker.join(timeout=5.0)
+    # A worker killed outright (OOM, segfault) never reports; count it as a failed session
+    for index, worker in enumerate(workers):
+        if index not in records:
+            records[index] = {
+                'index': index,
+                'initial_load': None,
+                'timings': [],
+                'failures': [f"worker exited with code {worker.exitcode} without reporting"],
+                'cpu_seconds': 0.0,
+                'loaded_rss': None,
+                'final_rss': None,
+            }
+    return [records[index] for index in range(len(workers))]
+
+
+def topology(args):
+    if args.pin_cpu is not None:
+        return f"isolated worker processes pinned to CPU {args.pin_cpu} (approximates one server process)"
+    return "isolated worker processes spread across all CPUs (not comparable to one server process)"
+
+
+def run_load_test(args):
+    ctx = multiprocessing.get_context("spawn")
+    start_gate = ctx.Barrier(args.sessions + 1)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=session_worker, args=(index, args, start_gate, results), daemon=True)
+        for index in range(args.sessions)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        start_gate.wait(timeout=args.timeout)
+    except threading.BrokenBarrierError:
+        pass
+    wall_started = time.perf_counter()
+    sessions = collect_results(workers, results)
+    wall = time.perf_counter() - wall_started
+
+    timings = [elapsed for session in sessions for _, elapsed in session['timings']]
+    by_step = {}
+    for session in sessions:
+        for step, elapsed in session['timings']:
+            by_step.setdefault(step, []).append(elapsed)
+    initial_loads = [session['initial_load'][1] for session in sessions if session['initial_load']]
+    cpu = sum(session['cpu_seconds'] for session in sessions)
+    measured = [session for session in sessions if session['final_rss'] is not None]
+    growth = [session['final_rss'] - session['loaded_rss'] for session in measured]
+
+    return {
+        'sessions': args.sessions,
+        'iterations': args.iterations,
+        'flow': args.flow,
+        'backend': f"cassette:{args.cassette}" if args.cassette else f"fake:{args.latency}s",
+        'topology': topology(args),
+        'pinned_cpu': args.pin_cpu,
+        'wall_seconds': round(wall, 3),
+        'reruns': len(timings),
+        'reruns_per_second': round(len(timings) / wall, 2) if wall else 0.0,
+        'completed_sessions': sum(1 for session in sessions if not session['failures']),
+        'failures': [failure for session in sessions for failure in session['failures']],
+        'initial_load': summarize(initial_loads),
+        'latency': summarize(timings),
+        'latency_by_step': {step: summarize(values) for step, values in by_step.items()},
+        'cpu_seconds': round(cpu, 3),
+        'cpu_seconds_per_session': round(cpu / args.sessions, 3),
+        'cpu_seconds_per_rerun': round(cpu / len(timings), 4) if timings else 0.0,
+        'cpu_utilization': round(cpu / wall, 2) if wall else 0.0,
+        'process_rss_mb': round(max((session['final_rss'] for session in measured), default=0) / 2 ** 20, 1),
+        'session_growth_mb': round(sum(growth) / len(growth) / 2 ** 20, 2) if growth else 0.0,
+    }
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p90_ms': round(percentile(values, 90) * 1000, 1),
+        'p99_ms': round(percentile(values, 99) * 1000, 1),
+        'max_ms': round(max(values, default=0.0) * 1000, 1),
+    }
+
+
+def print_report(report):
+    print(f"Sessions: {report['sessions']} x {report['iterations']} iteration(s) of the "
+          f"{report['flow']} flow, backend {report['backend']}")
+    print(f"Topology: {report['topology']}; no shared GIL, artifact store, prompt registry or cassette")
+    print(f"Completed sessions: {report['completed_sessions']}/{report['sessions']}")
+    print(f"Wall time: {report['wall_seconds']}s, {report['reruns']} reruns, "
+          f"{report['reruns_per_second']} reruns/s")
+    initial_load = report['initial_load']
+    print(f"Initial load: p50 {initial_load['p50_ms']}ms, max {initial_load['max_ms']}ms")
+    latency = report['latency']
+    print(f"Rerun latency: p50 {latency['p50_ms']}ms, p90 {latency['p90_ms']}ms, "
+          f"p99 {latency['p99_ms']}ms, max {latency['max_ms']}ms")
+    for step, stats in report['latency_by_step'].items():
+        print(f"  {step:<18} p50 {stats['p50_ms']:>8}ms  p90 {stats['p90_ms']:>8}ms  "
+              f"p99 {stats['p99_ms']:>8}ms  (n={stats['count']})")
+    print(f"CPU: {report['cpu_seconds']}s total, {report['cpu_seconds_per_session']}s per session, "
+          f"{report['cpu_seconds_per_rerun']}s per rerun, {report['cpu_utilization']} cores busy on average")
+    print(f"Memory: {report['process_rss_mb']} MB per isolated worker process, "
+          f"{report['session_growth_mb']} MB growth per session during the flow "
+          f"(shared state is not deduplicated as it would be in one server)")
+    for failure in report['failures'][:10]:
+        print(f"FAILED {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit studio with concurrent sessions")
+    parser.add_argument("--app", default="main_app.py", help="Streamlit script to drive")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--iterations", type=int, default=1, help="flow repetitions per session")
+    parser.add_argument("--flow", choices=sorted(FLOWS), default="both")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake backend seconds per completion")
+    parser.add_argument("--cassette", help="replay this cassette instead of the fake backend")
+    parser.add_argument("--realtime", action="store_true", help="replay cassette with original timing")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per rerun")
+    parser.add_argument("--all-cpus", action="store_true",
+                        help="let workers use every CPU instead of pinning them to one")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    # Not every platform can pin (macOS has no sched_setaffinity); the report says which ran
+    can_pin = hasattr(os, "sched_setaffinity") and not args.all_cpus
+    args.pin_cpu = min(os.sched_getaffinity(0)) if can_pin else None
+
+    report = run_load_test(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
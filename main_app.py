@@ -1,7 +1,10 @@
 import streamlit as st
 import os
-from groq import Groq
+from cassette import is_offline, make_client
 import time
+from code_checks import analyze_code, findings_note, fix_request, local_review
+from artifact_store import SessionArtifacts, memory_summary
+import prompts
 
 # App Configuration
 st.set_page_config(
@@ -12,14 +15,6 @@ st.set_page_config(
 
 # Session State Initialization
 session_defaults = {
-    'gen_content': "",
-    'content_critique': "",
-    'rev_content': "",
-    'gen_code': "",
-    'code_critique': "",
-    'rev_code': "",
-    'final_code': "",
-    'test_cases': "",
     'api_key': ""
 }
 
@@ -27,6 +22,16 @@ for key, default in session_defaults.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
+# LLM artifacts live in the shared artifact store, which spills cold ones to disk
+if 'artifacts' not in st.session_state:
+    st.session_state.artifacts = SessionArtifacts()
+artifacts = st.session_state.artifacts
+
+# Prompt costs are tallied for this session as well as for the whole server process
+if 'prompt_costs' not in st.session_state:
+    st.session_state.prompt_costs = {}
+prompts.bind_session(st.session_state.prompt_costs)
+
 # Sidebar Configuration
 with st.sidebar:
     st.title("🔑 API Key Setup")
@@ -47,7 +52,7 @@ with st.sidebar:
     st.divider()
     st.title("⚙️ Studio Configuration")
     
-    if not st.session_state.api_key:
+    if not st.session_state.api_key and not is_offline():
         st.warning("Please enter your API key above")
         st.stop()
     
@@ -66,11 +71,36 @@ with st.sidebar:
 
 # Initialize Groq client
 try:
-    client = Groq(api_key=st.session_state.api_key)
+    client = make_client(api_key=st.session_state.api_key)
 except Exception as e:
     st.error(f"Error initializing Groq client: {str(e)}")
     st.stop()
 
+# Local static pre-review for generated Python code
+def review_python(code, chat_history, temperature, max_tokens):
+    def regenerate(code, report):
+        fix_history = chat_history + [
+            {'role': 'assistant', 'content': code},
+            {'role': 'user', 'content': fix_request(report)}
+        ]
+        prompts.record_messages('fix_request', fix_history)
+        try:
+            fix_response = client.chat.completions.create(
+                messages=fix_history,
+                model=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            st.error(f"Automatic fix failed: {str(e)}")
+            return None
+        return fix_response.choices[0].message.content
+
+    code, _, fix_rounds = local_review(code, regenerate)
+    if fix_rounds:
+        st.info(f"Local checks found hard errors; applied {fix_rounds} automatic fix round(s).")
+    return code
+
 # Main App Tabs
 content_tab, code_tab = st.tabs(["🎨 Content Studio", "💻 Code Studio"])
 
@@ -98,32 +128,14 @@ with content_tab:
     if submitted:
         with st.spinner("Creating compelling content..."):
             # Build content prompt
-            user_prompt = (
-                f"Create {tone.lower()} marketing content about {topic}. "
-                f"Key features:\n{features}\n"
-                f"Target audience: {audience}."
+            generate_chat_history = prompts.render(
+                'content_generate',
+                tone=tone.lower(),
+                topic=topic,
+                features=features,
+                audience=audience
             )
             
-            generate_chat_history = [
-                {
-                    'role': 'system',
-                    'content': (
-                        "You are a visionary Content Creator specializing in compelling marketing narratives. "
-                        "Generate emotionally resonant content that:\n"
-                        "1. Captures attention immediately\n"
-                        "2. Highlights unique value propositions\n"
-                        "3. Uses vivid sensory language\n"
-                        "4. Includes strategic CTAs\n\n"
-                        "Format responses with:\n"
-                        "- Engaging headline\n"
-                        "- Core narrative (2-3 paragraphs)\n"
-                        "- Hashtag strategy\n"
-                        "- Platform-ready hooks (first 125 characters)"
-                    )
-                },
-                {'role': 'user', 'content': user_prompt}
-            ]
-            
             try:
                 response = client.chat.completions.create(
                     messages=generate_chat_history,
@@ -131,16 +143,16 @@ with content_tab:
                     temperature=temp_content,
                     max_tokens=max_tokens
                 )
-                st.session_state.gen_content = response.choices[0].message.content
+                artifacts.gen_content = response.choices[0].message.content
             except Exception as e:
                 st.error(f"Content generation failed: {str(e)}")
-                st.session_state.gen_content = ""
+                artifacts.gen_content = ""
     
     # Display generated content
-    if st.session_state.gen_content:
+    if artifacts.gen_content:
         st.subheader("Generated Content")
         with st.expander("View Content", expanded=True):
-            st.markdown(st.session_state.gen_content)
+            st.markdown(artifacts.gen_content)
         
         # Content Critique Section
         st.subheader("Content Enhancement")
@@ -149,35 +161,7 @@ with content_tab:
         with critique_col:
             if st.button("Get Expert Analysis", key="content_critique_btn"):
                 with st.spinner("Analyzing content quality..."):
-                    reflection_history = [
-                        {
-                            'role': 'system',
-                            'content': (
-                                "You are Darren Rowse, veteran content strategist with 15+ years experience. "
-                                "Provide razor-sharp critiques that:\n"
-                                "1. Evaluate content effectiveness\n"
-                                "2. Assess audience alignment\n"
-                                "3. Identify optimization opportunities\n\n"
-                                "Critique format:\n"
-                                "- 🎯 Objective Alignment (1-5)\n"
-                                "- 💔 Engagement Gaps\n"
-                                "- ✨ Top Strengths\n"
-                                "- 🔥 Improvement Priorities\n"
-                                "- 🛠️ Quick Wins"
-                            )
-                        },
-                        {
-                            'role': 'user',
-                            'content': (
-                                f"Analyze this marketing content:\n\n"
-                                f"```\n{st.session_state.gen_content}\n```\n\n"
-                                "Focus on:\n"
-                                "• Conversion potential\n"
-                                "• Brand voice consistency\n"
-                                "• Platform optimization"
-                            )
-                        }
-                    ]
+                    reflection_history = prompts.render('content_critique', content=artifacts.gen_content)
                     
                     try:
                         critique_response = client.chat.completions.create(
@@ -186,28 +170,23 @@ with content_tab:
                             temperature=0.1,
                             max_tokens=max_tokens
                         )
-                        st.session_state.content_critique = critique_response.choices[0].message.content
+                        artifacts.content_critique = critique_response.choices[0].message.content
                     except Exception as e:
                         st.error(f"Critique failed: {str(e)}")
         
-        if st.session_state.content_critique:
+        if artifacts.content_critique:
             with st.expander("Expert Critique", expanded=True):
-                st.markdown(st.session_state.content_critique)
+                st.markdown(artifacts.content_critique)
         
         # Content Revision
         with revise_col:
             if st.button("Generate Enhanced Version", key="content_revise_btn"):
                 with st.spinner("Refining content..."):
-                    revision_history = [
-                        {
-                            'role': 'system',
-                            'content': "You are an expert content editor. Improve the following content based on the critique."
-                        },
-                        {
-                            'role': 'user',
-                            'content': f"Original Content:\n{st.session_state.gen_content}\n\nCritique:\n{st.session_state.content_critique}"
-                        }
-                    ]
+                    revision_history = prompts.render(
+                        'content_revise',
+                        content=artifacts.gen_content,
+                        critique=artifacts.content_critique
+                    )
                     
                     try:
                         revision_response = client.chat.completions.create(
@@ -216,16 +195,16 @@ with content_tab:
                             temperature=temp_content,
                             max_tokens=max_tokens
                         )
-                        st.session_state.rev_content = revision_response.choices[0].message.content
+                        artifacts.rev_content = revision_response.choices[0].message.content
                     except Exception as e:
                         st.error(f"Revision failed: {str(e)}")
         
-        if st.session_state.rev_content:
+        if artifacts.rev_content:
             with st.expander("Refined Content", expanded=True):
-                st.markdown(st.session_state.rev_content)
+                st.markdown(artifacts.rev_content)
                 st.download_button(
                     label="Download Content",
-                    data=st.session_state.rev_content,
+                    data=artifacts.rev_content,
                     file_name="enhanced_content.md",
                     mime="text/markdown"
                 )
@@ -251,23 +230,12 @@ with code_tab:
     
     if submitted_code:
         with st.spinner("Crafting code solution..."):
-            generate_chat_history = [
-                {
-                    'role': 'system',
-                    'content': (
-                        f"You are an expert {language} developer. Generate {quality.lower()}-quality code that is: "
-                        "1. Correct and efficient\n"
-                        "2. Well-commented\n"
-                        "3. Handles edge cases\n"
-                        "4. Follows best practices\n\n"
-                        "Respond ONLY with code implementation, no explanations."
-                    )
-                },
-                {
-                    'role': 'user',
-                    'content': task
-                }
-            ]
+            generate_chat_history = prompts.render(
+                'code_generate',
+                language=language,
+                quality=quality.lower(),
+                task=task
+            )
             
             try:
                 response = client.chat.completions.create(
@@ -276,16 +244,20 @@ with code_tab:
                     temperature=temp_code,
                     max_tokens=max_tokens
                 )
-                st.session_state.gen_code = response.choices[0].message.content
+                artifacts.gen_code = response.choices[0].message.content
+                if language == "Python":
+                    artifacts.gen_code = review_python(
+                        artifacts.gen_code, generate_chat_history, temp_code, max_tokens
+                    )
             except Exception as e:
                 st.error(f"Code generation failed: {str(e)}")
-                st.session_state.gen_code = ""
+                artifacts.gen_code = ""
     
     # Display generated code
-    if st.session_state.gen_code:
+    if artifacts.gen_code:
         st.subheader("Generated Code")
         with st.expander("View Code", expanded=True):
-            st.code(st.session_state.gen_code, language='python')
+            st.code(artifacts.gen_code, language='python')
         
         # Code Critique Section
         st.subheader("Code Enhancement")
@@ -294,27 +266,15 @@ with code_tab:
         with critique_col:
             if st.button("Get Code Review", key="code_critique_btn"):
                 with st.spinner("Analyzing code quality..."):
-                    reflection_history = [
-                        {
-                            'role': 'system',
-                            'content': (
-                                "You are Andrej Karpathy, an experienced computer scientist. "
-                                "Provide technical critique focusing on:\n"
-                                "1. Algorithm correctness\n"
-                                "2. Code efficiency\n"
-                                "3. Edge case handling\n"
-                                "4. Best practices\n\n"
-                                "Format:\n"
-                                "- ✅ Strengths\n"
-                                "- ⚠️ Weaknesses\n"
-                                "- 🚀 Improvement Suggestions"
-                            )
-                        },
-                        {
-                            'role': 'user',
-                            'content': f"Review this code:\n\n```{language.lower()}\n{st.session_state.gen_code}\n```"
-                        }
-                    ]
+                    findings = ""
+                    if language == "Python":
+                        findings = findings_note(analyze_code(artifacts.gen_code))
+                    reflection_history = prompts.render(
+                        'code_critique',
+                        fence=language.lower(),
+                        code=artifacts.gen_code,
+                        findings=findings
+                    )
                     
                     try:
                         critique_response = client.chat.completions.create(
@@ -323,31 +283,24 @@ with code_tab:
                             temperature=0.1,
                             max_tokens=max_tokens
                         )
-                        st.session_state.code_critique = critique_response.choices[0].message.content
+                        artifacts.code_critique = critique_response.choices[0].message.content
                     except Exception as e:
                         st.error(f"Code critique failed: {str(e)}")
         
-        if st.session_state.code_critique:
+        if artifacts.code_critique:
             with st.expander("Expert Code Review", expanded=True):
-                st.markdown(st.session_state.code_critique)
+                st.markdown(artifacts.code_critique)
         
         # Code Revision
         with refine_col:
             if st.button("Generate Improved Code", key="code_revise_btn"):
                 with st.spinner("Refining code implementation..."):
-                    revision_history = [
-                        {
-                            'role': 'system',
-                            'content': "You are a senior software engineer. Improve the code based on the review."
-                        },
-                        {
-                            'role': 'user',
-                            'content': (
-                                f"Original Code:\n```{language.lower()}\n{st.session_state.gen_code}\n```\n\n"
-                                f"Code Review:\n{st.session_state.code_critique}"
-                            )
-                        }
-                    ]
+                    revision_history = prompts.render(
+                        'code_revise',
+                        fence=language.lower(),
+                        code=artifacts.gen_code,
+                        critique=artifacts.code_critique
+                    )
                     
                     try:
                         revision_response = client.chat.completions.create(
@@ -356,40 +309,32 @@ with code_tab:
                             temperature=temp_code,
                             max_tokens=max_tokens
                         )
-                        st.session_state.rev_code = revision_response.choices[0].message.content
+                        artifacts.rev_code = revision_response.choices[0].message.content
+                        if language == "Python":
+                            artifacts.rev_code = review_python(
+                                artifacts.rev_code, revision_history, temp_code, max_tokens
+                            )
                     except Exception as e:
                         st.error(f"Code revision failed: {str(e)}")
         
-        if st.session_state.rev_code:
+        if artifacts.rev_code:
             with st.expander("Refined Code", expanded=True):
-                st.code(st.session_state.rev_code, language='python')
+                st.code(artifacts.rev_code, language='python')
                 st.download_button(
                     label="Download Code",
-                    data=st.session_state.rev_code,
+                    data=artifacts.rev_code,
                     file_name="refined_code.py",
                     mime="text/plain"
                 )
         
         # Advanced Refinement
-        if st.session_state.rev_code and st.button("Production Refinement", key="final_refinement"):
+        if artifacts.rev_code and st.button("Production Refinement", key="final_refinement"):
             with st.spinner("Applying professional-grade refinements..."):
-                refinement_history = [
-                    {
-                        'role': 'system',
-                        'content': (
-                            "You are a senior software engineer. "
-                            "Transform this code into production-ready quality:"
-                            "\n1. Add comprehensive error handling"
-                            "\n2. Optimize performance"
-                            "\n3. Include documentation"
-                            "\n4. Ensure PEP-8 compliance"
-                        )
-                    },
-                    {
-                        'role': 'user',
-                        'content': f"Refine this code:\n```python\n{st.session_state.rev_code}\n```"
-                    }
-                ]
+                refinement_history = prompts.render(
+                    'code_refine',
+                    fence=language.lower(),
+                    code=artifacts.rev_code
+                )
                 
                 try:
                     final_response = client.chat.completions.create(
@@ -398,16 +343,20 @@ with code_tab:
                         temperature=0.1,
                         max_tokens=max_tokens
                     )
-                    st.session_state.final_code = final_response.choices[0].message.content
+                    artifacts.final_code = final_response.choices[0].message.content
+                    if language == "Python":
+                        artifacts.final_code = review_python(
+                            artifacts.final_code, refinement_history, 0.1, max_tokens
+                        )
                 except Exception as e:
                     st.error(f"Final refinement failed: {str(e)}")
         
-        if st.session_state.final_code:
+        if artifacts.final_code:
             with st.expander("Production-Grade Code", expanded=True):
-                st.code(st.session_state.final_code, language='python')
+                st.code(artifacts.final_code, language='python')
                 st.download_button(
                     label="Download Production Code",
-                    data=st.session_state.final_code,
+                    data=artifacts.final_code,
                     file_name="production_code.py",
                     mime="text/plain"
                 )
@@ -415,32 +364,43 @@ with code_tab:
                 # Generate test cases
                 if st.button("Generate Test Cases", key="test_cases_btn"):
                     with st.spinner("Creating comprehensive tests..."):
-                        test_prompt = (
-                            f"Generate comprehensive test cases for this {language} code. "
-                            f"Include edge cases and format as executable code:\n\n"
-                            f"```{language.lower()}\n{st.session_state.final_code}\n```"
+                        test_history = prompts.render(
+                            'test_cases',
+                            language=language,
+                            fence=language.lower(),
+                            code=artifacts.final_code
                         )
                         
                         try:
                             test_response = client.chat.completions.create(
-                                messages=[{'role': 'user', 'content': test_prompt}],
+                                messages=test_history,
                                 model=model_name,
                                 temperature=0.1,
                                 max_tokens=1000
                             )
-                            st.session_state.test_cases = test_response.choices[0].message.content
+                            artifacts.test_cases = test_response.choices[0].message.content
+                            if language == "Python":
+                                artifacts.test_cases = review_python(
+                                    artifacts.test_cases, test_history, 0.1, 1000
+                                )
                         except Exception as e:
                             st.error(f"Test generation failed: {str(e)}")
         
-        if st.session_state.test_cases:
+        if artifacts.test_cases:
             with st.expander("Test Cases", expanded=True):
-                st.code(st.session_state.test_cases, language='python')
+                st.code(artifacts.test_cases, language='python')
                 st.download_button(
                     label="Download Tests",
-                    data=st.session_state.test_cases,
+                    data=artifacts.test_cases,
                     file_name="test_cases.py",
                     mime="text/plain"
                 )
 
+st.sidebar.caption(memory_summary())
+with st.sidebar.expander("Prompt token cost, this session (estimated)"):
+    st.markdown(prompts.cost_markdown(st.session_state.prompt_costs))
+with st.sidebar.expander("Prompt token cost, all sessions on this server (estimated)"):
+    st.markdown(prompts.cost_markdown())
+
 # Rate limiting to avoid API errors
 time.sleep(0.5)
\ No newline at end of file
@@ -0,0 +1,299 @@
+import re
+import threading
+from string import Formatter
+
+# Central registry for every prompt the apps send. Templates are parsed once at import; system
+# prompts are rendered once per distinct persona/parameter set and cached together with their
+# token estimate, so identical stages always send a byte-identical prefix. Only the user part is
+# rendered per request. Bump a template's version whenever its text changes.
+#
+# Costs are tallied for the whole process and, once a script run calls bind_session(), for the
+# current session as well. render() records the messages it returns; text() only renders a
+# fragment, so a stage that sends a longer history records it with record_messages().
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    # Word and punctuation pieces track BPE token counts closely for English prose and code
+    return len(TOKEN_PATTERN.findall(text)) if text else 0
+
+
+def compile_template(text):
+    if text is None:
+        return None, ()
+    parts = list(Formatter().parse(text))
+    fields = tuple(field for _, field, _, _ in parts if field)
+    return parts, fields
+
+
+def render_parts(parts, values):
+    return "".join(literal + (str(values[field]) if field else "") for literal, field, _, _ in parts)
+
+
+class PromptTemplate:
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.system_parts, self.system_fields = compile_template(system)
+        self.user_parts, self.user_fields = compile_template(user)
+        self.system_cache = {}
+
+    def system(self, values):
+        if self.system_parts is None:
+            return None, 0
+        key = tuple(values[field] for field in self.system_fields)
+        if key not in self.system_cache:
+            text = render_parts(self.system_parts, values)
+            self.system_cache[key] = (text, estimate_tokens(text))
+        return self.system_cache[key]
+
+    def user(self, values):
+        return render_parts(self.user_parts, values)
+
+
+class PromptRegistry:
+    def __init__(self):
+        self.templates = {}
+        self.lock = threading.Lock()
+        self.costs = {}
+        # Streamlit runs each session's script in its own thread
+        self.session = threading.local()
+
+    def register(self, name, version, system=None, user="{content}"):
+        self.templates[name] = PromptTemplate(name, version, system, user)
+
+    def render(self, name, **values):
+        template = self.templates[name]
+        system, system_tokens = template.system(values)
+        user = template.user(values)
+        self.record(name, system_tokens, estimate_tokens(user))
+        messages = [{'role': 'user', 'content': user}]
+        if system is not None:
+            messages.insert(0, {'role': 'system', 'content': system})
+        return messages
+
+    def text(self, name, **values):
+        return self.templates[name].user(values)
+
+    def bind_session(self, costs):
+        self.session.costs = costs
+
+    def record_messages(self, name, messages):
+        # The system prompt is the cacheable prefix; every other turn counts as variable
+        system_tokens = sum(estimate_tokens(m['content']) for m in messages if m['role'] == 'system')
+        other_tokens = sum(estimate_tokens(m['content']) for m in messages if m['role'] != 'system')
+        self.record(name, system_tokens, other_tokens)
+
+    def record(self, name, system_tokens, user_tokens):
+        with self.lock:
+            tallies = [self.costs]
+            session_costs = getattr(self.session, 'costs', None)
+            if session_costs is not None:
+                tallies.append(session_costs)
+            for costs in tallies:
+                cost = costs.setdefault(name, {'calls': 0, 'static_tokens': 0, 'variable_tokens': 0})
+                cost['calls'] += 1
+                cost['static_tokens'] += system_tokens
+                cost['variable_tokens'] += user_tokens
+
+    def cost_report(self, costs=None):
+        costs = self.costs if costs is None else costs
+        with self.lock:
+            return [
+                {
+                    'stage': name,
+                    'version': self.templates[name].version,
+                    **cost,
+                    'total_tokens': cost['static_tokens'] + cost['variable_tokens'],
+                }
+                for name, cost in costs.items()
+            ]
+
+
+def cost_markdown(costs=None):
+    rows = registry.cost_report(costs)
+    if not rows:
+        return "No prompts sent yet"
+    lines = ["| Stage | Calls | System | Variable | Total |", "|---|---|---|---|---|"]
+    for row in rows:
+        lines.append(
+            f"| {row['stage']} v{row['version']} | {row['calls']} | ~{row['static_tokens']} "
+            f"| ~{row['variable_tokens']} | ~{row['total_tokens']} |"
+        )
+    return "\n".join(lines)
+
+
+registry = PromptRegistry()
+render = registry.render
+text = registry.text
+record_messages = registry.record_messages
+bind_session = registry.bind_session
+
+# ====================================
+# Content Studio
+# ====================================
+registry.register(
+    'content_generate', 1,
+    system=(
+        "You are a visionary Content Creator specializing in compelling marketing narratives. "
+        "Generate emotionally resonant content that:\n"
+        "1. Captures attention within 3 seconds\n"
+        "2. Highlights unique value propositions\n"
+        "3. Uses vivid sensory language\n"
+        "4. Includes strategic CTAs\n\n"
+        "Format responses with:\n"
+        "- Engaging headline\n"
+        "- Core narrative (2-3 paragraphs)\n"
+        "- Hashtag strategy\n"
+        "- Platform-ready hooks (first 125 characters)"
+    ),
+    user=(
+        "Create {tone} marketing content about {topic}. "
+        "Key features:\n{features}\n"
+        "Target audience: {audience}."
+    )
+)
+registry.register(
+    'content_critique', 1,
+    system=(
+        "You are Darren Rowse, veteran content strategist with 15+ years experience. "
+        "Provide razor-sharp critiques that:\n"
+        "1. Evaluate content effectiveness against marketing objectives\n"
+        "2. Assess emotional resonance and audience alignment\n"
+        "3. Identify structural weaknesses and optimization opportunities\n\n"
+        "Critique format:\n"
+        "- 🎯 Objective Alignment (1-5)\n"
+        "- 💔 Engagement Gaps\n"
+        "- ✨ Top Strengths\n"
+        "- 🔥 Improvement Priorities\n"
+        "- 🛠️ Quick Wins\n"
+        "- 📈 Strategic Recommendations"
+    ),
+    user=(
+        "Perform expert content audit on this marketing content:\n\n"
+        "```\n{content}\n```\n\n"
+        "Key evaluation criteria:\n"
+        "• Conversion potential\n"
+        "• Brand voice consistency\n"
+        "• Platform-specific optimization"
+    )
+)
+registry.register(
+    'content_revise', 1,
+    system="You are an expert content editor. Improve the following content based on the provided critique.",
+    user="Original Content:\n{content}\n\nCritique:\n{critique}"
+)
+
+# ====================================
+# Code Studio
+# ====================================
+registry.register(
+    'code_generate', 1,
+    system=(
+        "You are an expert software developer. Generate code in the requested language and quality "
+        "level that is:\n"
+        "1. Correct and efficient\n"
+        "2. Well-commented\n"
+        "3. Handles edge cases\n"
+        "4. Follows best practices\n\n"
+        "Respond ONLY with code implementation, no explanations."
+    ),
+    user="Language: {language}\nCode quality: {quality}\n\nTask: {task}"
+)
+registry.register(
+    'code_critique', 1,
+    system=(
+        "You are Andrej Karpathy, an experienced computer scientist. "
+        "Provide technical critique focusing on:\n"
+        "1. Algorithm correctness\n"
+        "2. Code efficiency\n"
+        "3. Edge case handling\n"
+        "4. Best practices\n\n"
+        "Format:\n"
+        "- ✅ Strengths\n"
+        "- ⚠️ Weaknesses\n"
+        "- 🚀 Improvement Suggestions"
+    ),
+    user="Review this code:\n\n```{fence}\n{code}\n```{findings}"
+)
+registry.register(
+    'code_revise', 1,
+    system="You are a senior software engineer. Improve the code based on the review.",
+    user="Original Code:\n```{fence}\n{code}\n```\n\nCode Review:\n{critique}"
+)
+registry.register(
+    'code_refine', 1,
+    system=(
+        "You are a senior software engineer. "
+        "Transform this code into production-ready quality:"
+        "\n1. Add comprehensive error handling"
+        "\n2. Optimize performance"
+        "\n3. Include documentation"
+        "\n4. Ensure PEP-8 compliance"
+    ),
+    user="Refine this code:\n```{fence}\n{code}\n```"
+)
+registry.register(
+    'test_cases', 1,
+    system=(
+        "You are a test engineer. Generate comprehensive test cases for the given code. "
+        "Include edge cases and format as executable code."
+    ),
+    user="Language: {language}\n\n```{fence}\n{code}\n```"
+)
+
+# ====================================
+# Reflection loop (app.py)
+# ====================================
+registry.register(
+    'reflection_generate', 1,
+    system="You are an expert Python developer. Respond only with code.",
+    user="{task}"
+)
+registry.register(
+    'reflection_critique', 1,
+    system=(
+        "You are {persona} providing technical critique. Focus on:\n"
+        "1. Algorithm correctness\n2. Code efficiency\n3. Edge cases\n4. Python best practices"
+    ),
+    user="Critique this code:\n\n{code}{findings}"
+)
+registry.register(
+    'reflection_incremental_critique', 1,
+    system=(
+        "You are {persona} providing technical critique. Focus on:\n"
+        "1. Algorithm correctness\n2. Code efficiency\n3. Edge cases\n4. Python best practices"
+    ),
+    user=(
+        "Your previous critique:\n\n{previous_critique}\n\n"
+        "The code was revised. Compact diff against the previous version:\n\n```diff\n{diff}\n```\n\n"
+        "Changed regions of the revised code (with line numbers and surrounding context):\n\n"
+        "```python\n{regions}\n```\n\n"
+        "Review only what changed:\n"
+        "1. Which issues from your previous critique are resolved, and which remain?\n"
+        "2. Did the changes introduce any new issues?{findings}"
+    )
+)
+registry.register(
+    'reflection_revise', 1,
+    user="Based on this critique, revise the implementation:\n\n{critique}"
+)
+
+# ====================================
+# Shared fragments
+# ====================================
+registry.register(
+    'fix_request', 1,
+    user=(
+        "Local static analysis found problems that must be fixed before review:\n\n"
+        "{findings}\n\n"
+        "Revise the implementation to fix them. Respond only with code."
+    )
+)
+registry.register(
+    'findings_note', 1,
+    user=(
+        "\n\nLocal static analysis already reported the following; "
+        "focus on issues it cannot detect:\n\n{findings}"
+    )
+)
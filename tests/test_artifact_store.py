@@ -0,0 +1,64 @@
+import os
+import random
+import threading
+
+from artifact_store import SPILL_ROOT_NAME, ArtifactStore
+
+
+def test_missing_spill_file_reads_as_default(tmp_path):
+    store = ArtifactStore(10, str(tmp_path))
+    store.put("s", "a", "a" * 60)
+    store.put("s", "b", "b" * 60)
+    path, _ = store.spilled[("s", "a")]
+    os.remove(path)
+
+    assert store.get("s", "a", default=None) is None
+    assert ("s", "a") not in store.spilled
+    assert store.get("s", "b") == "b" * 60
+
+
+def test_startup_removes_only_unlocked_spill_dirs(tmp_path):
+    live = ArtifactStore(10, str(tmp_path))
+    live.put("s", "a", "a" * 60)
+    live.put("s", "b", "b" * 60)
+    # Left behind by a killed process: the kernel dropped its lock, the files stayed
+    stale_dir = tmp_path / SPILL_ROOT_NAME / "1-deadbeef"
+    (stale_dir / "s").mkdir(parents=True)
+    (stale_dir / "s" / "x.z").write_bytes(b"")
+    (tmp_path / SPILL_ROOT_NAME / "1-deadbeef.lock").write_bytes(b"")
+
+    other = ArtifactStore(10, str(tmp_path))
+
+    assert not stale_dir.exists()
+    assert not (tmp_path / SPILL_ROOT_NAME / "1-deadbeef.lock").exists()
+    assert other.spill_dir != live.spill_dir
+    assert live.get("s", "a") == "a" * 60
+
+
+def test_concurrent_put_get_keeps_values_and_files_consistent(tmp_path):
+    store = ArtifactStore(2000, str(tmp_path))
+    errors = []
+
+    def worker(thread):
+        rnd = random.Random(thread)
+        session_id = f"s{thread % 4}"
+        expected = {}
+        for i in range(500):
+            name = f"t{thread}/k{rnd.randrange(20)}"
+            if rnd.random() < 0.5:
+                value = f"{name}:{i}:" + "x" * rnd.randrange(400)
+                store.put(session_id, name, value)
+                expected[name] = value
+            elif store.get(session_id, name, None) != expected.get(name):
+                errors.append(name)
+
+    threads = [threading.Thread(target=worker, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert not store.pending
+    files = sum(len(names) for _, _, names in os.walk(store.spill_dir))
+    assert files == len(store.spilled)